@@ -2,32 +2,44 @@ import pygame
 import pygame.midi
 import rtmidi
 import time
+import queue
+import threading
 from collections import deque
 from midiutil import MIDIFile
 from dataclasses import dataclass
 from typing import List, Deque
 
-@dataclass
+@dataclass(slots=True)
 class MidiEvent:
     note: int
     velocity: int
     timestamp: float
 
 class MidiPiano:
+    HANDLED_EVENTS = [pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.WINDOWEXPOSED]
+
     def __init__(self):
         # Initialize Pygame
         pygame.init()
         pygame.midi.init()
+        # Let SDL drop everything else (mouse motion floods etc.) before it reaches Python
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(self.HANDLED_EVENTS)
         
         # Set up display
         self.width = 600
         self.height = 400
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("MIDI Piano")
+        self.clock = pygame.time.Clock()
         
         # Initialize MIDI output
         self.midiout = rtmidi.MidiOut()
         self.midiout.open_port(0)  # Open first available port
+        # Notes go out from a sender thread, so a slow MIDI port delays notes rather than frames
+        self.midi_queue = queue.SimpleQueue()
+        self.midi_thread = threading.Thread(target=self.pump_midi, daemon=True)
+        self.midi_thread.start()
         
         # Button properties
         self.buttons = [
@@ -40,25 +52,56 @@ class MidiPiano:
         # Save button
         self.save_button = pygame.Rect(250, 320, 100, 40)
         
-        # Recording buffer (30 seconds)
-        self.recording_buffer: Deque[MidiEvent] = deque()
+        # Pre-render the interface once, only pressed keys are drawn per frame
+        self.font = pygame.font.Font(None, 36)
+        self.static_bg = self.render_static_background()
+        self.pressed_keys = set()
+        self.changed_keys = set()  # Keys to redraw on the next frame
+        self._pressed_surf = pygame.Surface(self.buttons[0]["rect"].size).convert()
+        self._pressed_surf.fill((150, 150, 150))
+        pygame.draw.rect(self._pressed_surf, (0, 0, 0), self._pressed_surf.get_rect(), 2)
+        
+        # Recording buffer (30 seconds), bounded for up to 1000 events per second
+        self.recording_duration = 30
+        self.recording_buffer: Deque[MidiEvent] = deque(maxlen=self.recording_duration * 1000)
         self.start_time = time.time()
 
-    def handle_midi_event(self, note: int, velocity: int):
-        """Send MIDI message and store in buffer"""
+    def render_static_background(self) -> pygame.Surface:
+        surface = pygame.Surface((self.width, self.height)).convert()
+        surface.fill((255, 255, 255))
+        
+        # Draw piano keys
+        for button in self.buttons:
+            pygame.draw.rect(surface, button["color"], button["rect"])
+            pygame.draw.rect(surface, (0, 0, 0), button["rect"], 2)
+        
+        # Draw save button
+        pygame.draw.rect(surface, (100, 200, 100), self.save_button)
+        text = self.font.render("Save", True, (0, 0, 0))
+        text_rect = text.get_rect(center=self.save_button.center)
+        surface.blit(text, text_rect)
+        return surface
+
+    def pump_midi(self):
+        """Send queued MIDI messages until a None sentinel arrives"""
+        while True:
+            message = self.midi_queue.get()
+            if message is None:
+                break
+            self.midiout.send_message(message)
+
+    def handle_midi_event(self, note: int, velocity: int, timestamp: float = None):
+        """Send MIDI message and store in buffer, timestamp defaults to now"""
         if velocity > 0:  # Note On
-            self.midiout.send_message([0x90, note, velocity])
+            self.midi_queue.put((0x90, note, velocity))
         else:  # Note Off
-            self.midiout.send_message([0x80, note, 0])
+            self.midi_queue.put((0x80, note, 0))
             
         # Store event in buffer
-        current_time = time.time() - self.start_time
+        if timestamp is None:
+            timestamp = time.time()
+        current_time = timestamp - self.start_time
         self.recording_buffer.append(MidiEvent(note, velocity, current_time))
-        
-        # Remove events older than 30 seconds
-        while (self.recording_buffer and 
-               current_time - self.recording_buffer[0].timestamp > 30):
-            self.recording_buffer.popleft()
 
     def save_recording(self):
         """Save the last 30 seconds of MIDI events to a file"""
@@ -68,9 +111,10 @@ class MidiPiano:
         midi = MIDIFile(1)  # One track
         midi.addTempo(0, 0, 120)  # Track 0, time 0, tempo 120 BPM
 
-        # Convert buffer events to MIDI file
+        # Convert buffer events to MIDI file, skipping events older than 30 seconds
+        cutoff = time.time() - self.start_time - self.recording_duration
         for event in self.recording_buffer:
-            if event.velocity > 0:  # Note On
+            if event.velocity > 0 and event.timestamp >= cutoff:  # Note On
                 # Convert time to beats (assuming 120 BPM)
                 time_beats = event.timestamp * 2  # 2 beats per second at 120 BPM
                 midi.addNote(0, 0, event.note, time_beats, 0.5, event.velocity)
@@ -80,18 +124,22 @@ class MidiPiano:
             midi.writeFile(f)
 
     def run(self):
+        exposed = True  # Paint the whole window on the first frame
         running = True
         while running:
-            for event in pygame.event.get():
+            # One timestamp per frame is plenty for MIDI events from this UI
+            frame_now = time.time()
+            for event in pygame.event.get(self.HANDLED_EVENTS):
                 if event.type == pygame.QUIT:
                     running = False
                 
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     # Check piano keys
-                    for button in self.buttons:
+                    for i, button in enumerate(self.buttons):
                         if button["rect"].collidepoint(event.pos):
-                            button["color"] = (150, 150, 150)
-                            self.handle_midi_event(button["note"], 100)
+                            self.pressed_keys.add(i)
+                            self.changed_keys.add(i)
+                            self.handle_midi_event(button["note"], 100, frame_now)
                     
                     # Check save button
                     if self.save_button.collidepoint(event.pos):
@@ -99,29 +147,46 @@ class MidiPiano:
                 
                 if event.type == pygame.MOUSEBUTTONUP:
                     # Reset piano keys
-                    for button in self.buttons:
+                    for i, button in enumerate(self.buttons):
                         if button["rect"].collidepoint(event.pos):
-                            button["color"] = (200, 200, 200)
-                            self.handle_midi_event(button["note"], 0)
+                            self.pressed_keys.discard(i)
+                            self.changed_keys.add(i)
+                            self.handle_midi_event(button["note"], 0, frame_now)
 
-            # Draw interface
-            self.screen.fill((255, 255, 255))
-            
-            # Draw piano keys
-            for button in self.buttons:
-                pygame.draw.rect(self.screen, button["color"], button["rect"])
-                pygame.draw.rect(self.screen, (0, 0, 0), button["rect"], 2)
-            
-            # Draw save button
-            pygame.draw.rect(self.screen, (100, 200, 100), self.save_button)
-            font = pygame.font.Font(None, 36)
-            text = font.render("Save", True, (0, 0, 0))
-            text_rect = text.get_rect(center=self.save_button.center)
-            self.screen.blit(text, text_rect)
+                if event.type == pygame.WINDOWEXPOSED:
+                    exposed = True
+
+            # The window contents were lost (uncovered, restored), repaint everything
+            if exposed:
+                self.screen.blit(self.static_bg, (0, 0))
+                self.changed_keys.update(self.pressed_keys)
+
+            # Nothing changed, the screen is kept from earlier frames
+            if not self.changed_keys and not exposed:
+                self.clock.tick(60)
+                continue
+
+            # Redraw only keys that changed
+            dirty = []
+            for i in self.changed_keys:
+                rect = self.buttons[i]["rect"]
+                if i in self.pressed_keys:
+                    self.screen.blit(self._pressed_surf, rect)
+                else:
+                    self.screen.blit(self.static_bg, rect, rect)
+                dirty.append(rect)
+            self.changed_keys.clear()
             
-            pygame.display.flip()
+            if exposed:
+                pygame.display.flip()
+                exposed = False
+            else:
+                pygame.display.update(dirty)
+            self.clock.tick(60)
 
         # Cleanup
+        self.midi_queue.put(None)
+        self.midi_thread.join()
         self.midiout.close_port()
         pygame.midi.quit()
         pygame.quit()
@@ -3,45 +3,150 @@ import pygame.midi
 import rtmidi
 import time
 import argparse
-from collections import deque
+import queue
+import threading
+import numpy as np
 from midiutil import MIDIFile
 from dataclasses import dataclass
-from typing import List, Deque, Optional, Callable
+from typing import List, Dict, Optional, Callable, Sequence, Tuple
 from datetime import datetime
 
-@dataclass
+try:
+    from numba import njit
+except ImportError:  # Without numba the render kernel runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+@dataclass(slots=True)
 class MidiEvent:
     note: int
     velocity: int
     timestamp: float
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class PianoButton:
     rect: pygame.Rect
     keyboard_key:pygame.key
-    color: tuple
+    color_unpressed: tuple
+    color_pressed: tuple
     note: int
     is_pressed: bool = False
     label: str = ""
+    label_surf: Optional[pygame.Surface] = None
+    label_pos: tuple = (0, 0)
+
+class ColumnRing:
+    """
+    Bounded parallel NumPy columns, like a deque(maxlen) of rows.
+
+    Live rows are [tail:head] in append order. The columns have room for
+    2 * maxlen rows so compacting them back to the start happens at most
+    once per maxlen appends.
+    """
+
+    def __init__(self, maxlen: int, **dtypes):
+        self.columns = {name: np.zeros(2 * maxlen, dtype=dtype) for name, dtype in dtypes.items()}
+        self.maxlen = maxlen
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self) -> int:
+        return self.head - self.tail
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name][self.tail:self.head]
+
+    def append(self, *row):
+        if len(self) == self.maxlen:
+            # Full, drop the oldest row
+            self.tail += 1
+        if self.head == 2 * self.maxlen:
+            self._compact()
+        for column, value in zip(self.columns.values(), row):
+            column[self.head] = value
+        self.head += 1
+
+    def drop_before(self, name: str, cutoff: float):
+        """Drop the oldest rows while their (ascending) value in column name is below cutoff"""
+        self.tail += int(np.searchsorted(self[name], cutoff))
+
+    def _compact(self):
+        """Move the live rows back to the start of the columns"""
+        live = len(self)
+        for column in self.columns.values():
+            column[:live] = column[self.tail:self.head]
+        self.head = live
+        self.tail = 0
+
+@njit(cache=True)
+def _render_kernel(starts, ends, notes, vels, window_start, vp_left, vp_bottom,
+                   time_scale, note_scale, note_start, note_end, note_height):
+    """
+    Lay out finished notes as piano-roll rectangles.
+
+    Notes starting before window_start or outside [note_start, note_end] are
+    skipped. Returns (x, y, w, h) rects and the velocities of the kept notes.
+    """
+    rects = np.empty((len(starts), 4), dtype=np.int32)
+    rect_vels = np.empty(len(starts), dtype=np.uint8)
+    count = 0
+    for i in range(len(starts)):
+        note = notes[i]
+        if starts[i] < window_start or note < note_start or note > note_end:
+            continue
+        rects[count, 0] = int(vp_left + (starts[i] - window_start) * time_scale)
+        rects[count, 1] = int(vp_bottom - (note - note_start) * note_scale - note_height)
+        rects[count, 2] = int(max(1.0, (ends[i] - starts[i]) * time_scale))
+        rects[count, 3] = note_height
+        rect_vels[count] = vels[i]
+        count += 1
+    return rects[:count], rect_vels[:count]
+
+def warm_up_render_kernel():
+    """Trigger the one-off JIT compile before the UI starts"""
+    _render_kernel(np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float64),
+                   np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.uint8),
+                   0.0, 0, 200, 100.0, 4.0, 45, 93, 4)
 
 class MidiBuffer:
+    MAX_EVENT_RATE = 1000  # Events per second the ring buffer is sized for
+    # Finished note colors for 8 velocity buckets, from each bucket's mid velocity
+    VELOCITY_COLORS = [(min(255, v * 2), min(255, v * 2), 255) for v in range(8, 128, 16)]
+    ACTIVE_COLOR = (100, 255, 100)
+    TIME_WINDOW = 10.0  # Seconds of history shown in the piano roll
+
     def __init__(self, buffer_duration: float = 30.0):
-        self.buffer: Deque[MidiEvent] = deque()
+        # Timestamps are seconds since start_time. The ring is bounded by
+        # MAX_EVENT_RATE, notes older than buffer_duration are dropped lazily.
+        capacity = int(buffer_duration * self.MAX_EVENT_RATE)
+        # Notes are paired as events arrive, finished notes are ordered by end time
+        self._active: Dict[int, Tuple[float, int]] = {}  # note_number -> (start_time, velocity)
+        self._finished = ColumnRing(capacity, note=np.int8, velocity=np.uint8,
+                                    start=np.float64, end=np.float64)
         self.buffer_duration = buffer_duration
         self.start_time = time.time()
 
+        # The piano roll is left as drawn until it is stale or new events arrive
+        self._roll_target: Optional[Tuple[pygame.Surface, Tuple[int, int, int, int]]] = None
+        self._roll_last_update = 0.0
+        self._roll_stale = True
+        self._roll_has_notes = False  # Whether the last drawing showed any notes
+        self._note_strips: List[pygame.Surface] = []
+
     def add_event(self, event: MidiEvent):
-        current_time = time.time() - self.start_time
-        self.buffer.append(event)
-        
-        # Cleanup old events
-        while (self.buffer and 
-               current_time - self.buffer[0].timestamp > self.buffer_duration):
-            self.buffer.popleft()
+        current_time = event.timestamp - self.start_time
+        self._roll_stale = True
+        if event.velocity > 0:
+            self._active[event.note] = (current_time, event.velocity)
+        elif event.note in self._active:
+            start_time, velocity = self._active.pop(event.note)
+            self._finished.append(event.note, velocity, start_time, current_time)
 
     def save_to_file(self, filename: str = None):
-        if not self.buffer:
-            print("No events to save")
+        # Cleanup old notes
+        self._finished.drop_before("end", time.time() - self.start_time - self.buffer_duration)
+        if not len(self._finished):
+            print("No notes to save")
             return
 
         if filename is None:
@@ -50,28 +155,71 @@ class MidiBuffer:
         midi = MIDIFile(1)
         midi.addTempo(0, 0, 120)
 
-        for event in self.buffer:
-            # if event.velocity > 0:
-            time_beats = event.timestamp * 2
-            midi.addNote(0, 0, event.note, time_beats, 0.5, event.velocity)
+        # Convert seconds to beats (2 beats per second at 120 BPM). Notes last at least
+        # one tick, midiutil can't write a note-on and note-off on the same tick.
+        min_beats = 1 / 960
+        for note, velocity, start, end in zip(self._finished["note"].tolist(),
+                                              self._finished["velocity"].tolist(),
+                                              self._finished["start"].tolist(),
+                                              self._finished["end"].tolist()):
+            midi.addNote(0, 0, note, start * 2, max((end - start) * 2, min_beats), velocity)
 
         with open(filename, "wb") as f:
             midi.writeFile(f)
         print(f"Saved recording to {filename}")
 
-    def render(self, surface: pygame.Surface, viewport_rect: pygame.Rect, current_relative_time: float):
+    def render(self, surface: pygame.Surface, viewport_rect: pygame.Rect, current_relative_time: float) -> bool:
         """
         Render MIDI notes as rectangles on a pygame surface.
+
+        The roll scrolls at whole pixels, so it is redrawn at most once per pixel of
+        scroll (TIME_WINDOW / viewport width) unless new events arrive, and not at
+        all while it shows no notes. The surface must keep its contents between
+        calls, e.g. a subsurface of the display.
         
         Args:
             surface: Pygame surface to render on
             viewport_rect: Rectangle defining the rendering area
             current_relative_time: Current time relative to start time
+
+        Returns:
+            True if the piano roll was redrawn, False if the last drawing was left as is
         """
+        target = (surface, tuple(viewport_rect))
+        pixel_interval = self.TIME_WINDOW / viewport_rect.width
+        redraw = (self._roll_stale
+                  or self._roll_target != target
+                  or (self._roll_has_notes
+                      and current_relative_time - self._roll_last_update >= pixel_interval))
+        if redraw:
+            self._roll_has_notes = self._draw_roll(surface, viewport_rect, current_relative_time)
+            self._roll_target = target
+            self._roll_last_update = current_relative_time
+            self._roll_stale = False
+        return redraw
+
+    def invalidate(self):
+        """Force a full piano roll redraw on the next render, e.g. after the window was exposed"""
+        self._roll_stale = True
+
+    def _get_note_strips(self, surface: pygame.Surface, width: int, height: int) -> List[pygame.Surface]:
+        """Solid width x height strips for each VELOCITY_COLORS bucket, then ACTIVE_COLOR last"""
+        if not self._note_strips or self._note_strips[0].get_size() != (width, height):
+            self._note_strips = []
+            for color in self.VELOCITY_COLORS + [self.ACTIVE_COLOR]:
+                strip = pygame.Surface((width, height), 0, surface)
+                strip.fill(color)
+                self._note_strips.append(strip)
+        return self._note_strips
+
+    def _draw_roll(self, surface: pygame.Surface, viewport_rect: pygame.Rect, current_relative_time: float) -> bool:
+        """Draw the piano roll, returns whether any notes were visible"""
         # Define the time window
-        time_window = 10.0  # 10 seconds window
+        time_window = self.TIME_WINDOW
         window_start = current_relative_time - time_window
-        window_end = current_relative_time
+
+        # Plain locals keep Rect attribute lookups out of the loops (and JIT friendly under PyPy)
+        left, top, right, bottom = viewport_rect.left, viewport_rect.top, viewport_rect.right, viewport_rect.bottom
         
         # Calculate scaling factors
         time_scale = viewport_rect.width / time_window
@@ -80,67 +228,53 @@ class MidiBuffer:
         # A2(45) to A7(93)
         note_range = 48  # 93 - 45 = 48 semitones total
         note_start = 45
+        note_end = 93
         note_scale = viewport_rect.height / note_range
         
         # Draw background
-        pygame.draw.rect(surface, (20, 20, 20), viewport_rect)
+        surface.fill((20, 20, 20), viewport_rect)
         
         # Draw piano roll grid lines (every octave)
         for octave in range(5):  # From A2 to A7
             midi_note = note_start + (octave * 12)  # Start from A2 and go up by octaves
-            y_pos = viewport_rect.bottom - ((midi_note - note_start) * note_scale)
+            y_pos = bottom - ((midi_note - note_start) * note_scale)
             pygame.draw.line(surface, (40, 40, 40),
-                            (viewport_rect.left, y_pos),
-                            (viewport_rect.right, y_pos))
+                            (left, y_pos),
+                            (right, y_pos))
         
-        # Keep track of active notes for proper rendering of note duration
-        active_notes = {}  # note_number -> (start_time, note_rectangle)
+        # Finished notes are in end time order, anything ending before the window starts before it too
+        finished = self._finished
+        lo = int(np.searchsorted(finished["end"], window_start))
+        rects, rect_vels = _render_kernel(
+            finished["start"][lo:], finished["end"][lo:], finished["note"][lo:], finished["velocity"][lo:],
+            window_start, left, bottom,
+            time_scale, note_scale, note_start, note_end, note_height)
+
+        # Every note is a cropped blit of a solid strip in its color, drawn in one blits call
+        strips = self._get_note_strips(surface, viewport_rect.width, note_height)
+
+        # Finished notes with color based on velocity bucket
+        blit_sequence = [(strips[bucket], (x, y), (0, 0, width, height))
+                         for (x, y, width, height), bucket in zip(rects.tolist(), (rect_vels >> 4).tolist())]
         
-        # Process all events in the buffer
-        for event in self.buffer:
-            if event.timestamp < window_start or event.timestamp > window_end:
+        # Still-active notes in a different color, width based on current time
+        active_strip = strips[-1]
+        for note, (start_time, _) in self._active.items():
+            if start_time < window_start or not note_start <= note <= note_end:
                 continue
-                
-            # Calculate x position based on event timestamp
-            event_x = viewport_rect.left + ((event.timestamp - window_start) * time_scale)
-            
-            if event.velocity > 0:
-                if note_start <= event.note <= 93:  # Only process notes in our range
-                    # Calculate y position relative to our note range
-                    note_y = viewport_rect.bottom - ((event.note - note_start) * note_scale)
-                    active_notes[event.note] = (event.timestamp, pygame.Rect(
-                        event_x, note_y - note_height, 2, note_height  # Start with minimal width
-                    ))
-                
-            elif event.velocity == 0:
-                if event.note in active_notes:
-                    start_time, note_rect = active_notes[event.note]
-                    # Calculate final width based on note duration
-                    note_duration = event.timestamp - start_time
-                    note_width = note_duration * time_scale
-                    note_rect.width = max(1, note_width)
-                    
-                    # Draw the note rectangle with color based on velocity
-                    velocity_color = min(255, event.velocity * 2)
-                    color = (velocity_color, velocity_color, 255)
-                    pygame.draw.rect(surface, color, note_rect)
-                    del active_notes[event.note]
-        
-        # Draw any still-active notes
-        for note, (start_time, note_rect) in active_notes.items():
-            # Calculate width based on current time
-            note_duration = current_relative_time - start_time
-            note_width = note_duration * time_scale
-            note_rect.width = max(1, note_width)
-            
-            # Draw still-active notes in a different color
-            pygame.draw.rect(surface, (100, 255, 100), note_rect)
+            note_x = left + ((start_time - window_start) * time_scale)
+            note_y = bottom - ((note - note_start) * note_scale)
+            note_width = max(1, (current_relative_time - start_time) * time_scale)
+            blit_sequence.append((active_strip, (note_x, note_y - note_height), (0, 0, note_width, note_height)))
+
+        surface.blits(blit_sequence, doreturn=False)
         
-        # Draw playhead line at current time
-        playhead_x = viewport_rect.right
+        # Draw playhead line at current time, along the inside of the right edge
+        playhead_x = right - 2
         pygame.draw.line(surface, (255, 50, 50),
-                        (playhead_x, viewport_rect.top),
-                        (playhead_x, viewport_rect.bottom), 2)
+                        (playhead_x, top),
+                        (playhead_x, bottom), 2)
+        return bool(blit_sequence)
 
 class MidiDevice:
     def __init__(self, port_name: str = None):
@@ -156,6 +290,18 @@ class MidiDevice:
             self._list_ports()
             raise ValueError("Invalid MIDI port name")
 
+        # rtmidi can block on the system MIDI stack, a sender thread keeps that off the UI thread
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+
+    def _pump(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            self.midiout.send_message(message)
+
     def _find_port(self) -> Optional[int]:
         available_ports = self.midiout.get_ports()
         if self.port_name:
@@ -173,12 +319,17 @@ class MidiDevice:
             print(f"{i}: {port}")
         midi_out.delete()
 
-    def send_message(self, message: List[int]):
+    def send_message(self, message: Sequence[int]):
         if self.midiout:
-            self.midiout.send_message(message)
+            self._queue.put(message)
+
+    def send_raw(self, status: int, note: int, velocity: int):
+        self.send_message((status, note, velocity))
 
     def cleanup(self):
         if self.midiout:
+            self._queue.put(None)
+            self._thread.join()
             self.midiout.close_port()
 
 
@@ -193,15 +344,22 @@ class MidiPiano:
         "asdfghjkl;' "
         "zxcvbnm,./  "
     )
+    HANDLED_EVENTS = [pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.KEYDOWN, pygame.KEYUP,
+                      pygame.WINDOWEXPOSED]
 
-    def __init__(self, midi_device: MidiDevice):
+    def __init__(self, midi_device: MidiDevice, fps: int = 60):
         pygame.init()
         pygame.midi.init()
+        # Let SDL drop everything else (mouse motion floods etc.) before it reaches Python
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(self.HANDLED_EVENTS)
         
         self.width = 1200
         self.height = 800
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("MIDI Piano")
+        self.clock = pygame.time.Clock()
+        self.fps = fps
         
         self.midi_device = midi_device
         self.event_handlers: List[Callable[[MidiEvent], None]] = []
@@ -211,20 +369,52 @@ class MidiPiano:
         self.button_height = 80
         self.grid_offset = 60  # Space for save button and other controls
         
+        # Initialize font
+        self.font = pygame.font.Font(None, 24)
+
         # Create button grid
         self.buttons = self.create_button_grid(start_note=40) 
+        self.buttons_by_key: Dict[str, PianoButton] = {
+            button.keyboard_key: button for button in self.buttons if button.keyboard_key}
+        self.changed_buttons = set()  # Buttons to redraw on the next frame
+        self._mouse_captured: Optional[PianoButton] = None  # Button held down by the mouse
         
         self.save_button = pygame.Rect(250, 320, 100, 40)
 
-        # Initialize font
-        self.font = pygame.font.Font(None, 24)
+        # Piano roll draws straight into its own region of the screen
+        self.roll_rect = pygame.Rect(20, 580, 1018, 200)
+        self.roll_surf = self.screen.subsurface(self.roll_rect)
+
+        # Pre-render the unpressed grid once, only pressed buttons are drawn per frame
+        self.static_bg = self.render_static_background()
+        self._pressed_surf = {}
+        for button in self.buttons:
+            if button.color_pressed not in self._pressed_surf:
+                surf = pygame.Surface(button.rect.size).convert()
+                surf.fill(button.color_pressed)
+                pygame.draw.rect(surf, (0, 0, 0), surf.get_rect(), 2)
+                self._pressed_surf[button.color_pressed] = surf
+
+    def render_static_background(self) -> pygame.Surface:
+        surface = pygame.Surface((self.width, self.height)).convert()
+        surface.fill((255, 255, 255))
+        for button in self.buttons:
+            pygame.draw.rect(surface, button.color_unpressed, button.rect)
+            pygame.draw.rect(surface, (0, 0, 0), button.rect, 2)
+            surface.blit(button.label_surf, button.label_pos)
+        return surface
     
     def create_button_grid(self, start_note: int) -> List[PianoButton]:
         buttons = []
         rows = 6
         cols = 12
         key_index = 0
+        # Buttons also indexed by [row][col] so hit tests are a closed-form lookup
+        self.grid: List[List[PianoButton]] = []
+        self._cell_w = self.button_width + 5
+        self._cell_h = self.button_height + 5
         for row in range(rows):
+            self.grid.append([])
             for col in range(cols):
                 warp = +1 if row > 1 else 0
                 start_note = 40
@@ -259,36 +449,65 @@ class MidiPiano:
                 button = PianoButton(
                     rect=pygame.Rect(x, y, self.button_width, self.button_height),
                     keyboard_key=keyboard_key,
-                    color=color,
+                    color_unpressed=color,
+                    color_pressed=tuple(c // 2 for c in color),
                     note=note_number,
                     label=label,
                 )
+                button.label_surf = self.font.render(label, True, (0, 0, 0)).convert_alpha()
+                button.label_pos = button.label_surf.get_rect(center=button.rect.center).topleft
 
                 
                 buttons.append(button)
+                self.grid[row].append(button)
         
         return buttons
 
+    def _hit(self, pos) -> Optional[PianoButton]:
+        """Return the button under pos, or None if it falls outside or between buttons"""
+        x, y = pos[0] - self.margin, pos[1] - self.grid_offset
+        if x < 0 or y < 0:
+            return None
+        col, col_offset = divmod(x, self._cell_w)
+        row, row_offset = divmod(y, self._cell_h)
+        if (row < len(self.grid) and col < len(self.grid[row])
+                and col_offset < self.button_width and row_offset < self.button_height):
+            return self.grid[row][col]
+        return None
+
     def add_event_handler(self, handler: Callable[[MidiEvent], None]):
         self.event_handlers.append(handler)
 
-    def emit_midi_event(self, note: int, velocity: int):
-        """Emit MIDI event to device and notify handlers"""
+    def press_button(self, button: PianoButton, ts: Optional[float] = None):
+        button.is_pressed = True
+        self.changed_buttons.add(button)
+        self.emit_midi_event(button.note, 100, ts)
+
+    def release_button(self, button: PianoButton, ts: Optional[float] = None):
+        button.is_pressed = False
+        self.changed_buttons.add(button)
+        self.emit_midi_event(button.note, 0, ts)
+
+    def emit_midi_event(self, note: int, velocity: int, ts: Optional[float] = None):
+        """Emit MIDI event to device and notify handlers, ts defaults to now"""
+        if ts is None:
+            ts = time.time()
         if velocity > 0:
-            self.midi_device.send_message([0x90, note, velocity])
+            self.midi_device.send_raw(0x90, note, velocity)
         else:
-            self.midi_device.send_message([0x80, note, 0])
+            self.midi_device.send_raw(0x80, note, 0)
             
-        event = MidiEvent(note, velocity, time.time())
+        event = MidiEvent(note, velocity, ts)
         for handler in self.event_handlers:
             handler(event)
 
     def run(self, midi_buffer):
-
-
+        exposed = True  # Paint the whole window on the first frame
         running = True
         while running:
-            for event in pygame.event.get():
+            # One timestamp per frame is plenty for MIDI events from this UI
+            frame_now = time.time()
+            for event in pygame.event.get(self.HANDLED_EVENTS):
                 if event.type == pygame.QUIT:
                     running = False
                 
@@ -296,41 +515,54 @@ class MidiPiano:
                     # if self.save_button.collidepoint(event.pos):
                     #     self.emit_midi_event(0, 0)  # Signal for save
                 
-                if event.type in [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.KEYDOWN, pygame.KEYUP]:
-                    for button in self.buttons:
-                        if event.type == pygame.MOUSEBUTTONDOWN:
-                            if button.rect.collidepoint(event.pos) and not button.is_pressed:
-                                button.is_pressed = True
-                                self.emit_midi_event(button.note, 100)
-
-                        elif event.type == pygame.MOUSEBUTTONUP:
-                            if button.is_pressed:
-                                button.is_pressed = False
-                                self.emit_midi_event(button.note, 0)
-
-                        elif event.type == pygame.KEYDOWN:
-                            if button.keyboard_key == event.unicode and not button.is_pressed:
-                                button.is_pressed = True
-                                self.emit_midi_event(button.note, 100)
-
-                        elif event.type == pygame.KEYUP:
-                            if button.keyboard_key == event.unicode and button.is_pressed:
-                                button.is_pressed = False
-                                self.emit_midi_event(button.note, 0)
-
-            # Draw interface
-            self.screen.fill((255, 255, 255))
-            
-            # Draw piano grid
-            for button in self.buttons:
-                cmul = 0.5 if button.is_pressed else 1
-                pygame.draw.rect(self.screen, tuple(int(c*cmul) for c in button.color), button.rect)
-                pygame.draw.rect(self.screen, (0, 0, 0), button.rect, 2)
-                
-                # Draw note label
-                text = self.font.render(button.label, True, (0, 0, 0))
-                text_rect = text.get_rect(center=button.rect.center)
-                self.screen.blit(text, text_rect)
+                # Only the left mouse button plays notes
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    if self._mouse_captured and self._mouse_captured.is_pressed:
+                        self.release_button(self._mouse_captured, frame_now)
+                    self._mouse_captured = None
+                    button = self._hit(event.pos)
+                    if button and not button.is_pressed:
+                        self.press_button(button, frame_now)
+                        self._mouse_captured = button
+
+                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                    # Release the button the mouse pressed, even if the cursor has moved off it
+                    button = self._mouse_captured
+                    self._mouse_captured = None
+                    if button and button.is_pressed:
+                        self.release_button(button, frame_now)
+
+                elif event.type == pygame.KEYDOWN:
+                    button = self.buttons_by_key.get(event.unicode)
+                    if button and not button.is_pressed:
+                        self.press_button(button, frame_now)
+
+                elif event.type == pygame.KEYUP:
+                    button = self.buttons_by_key.get(event.unicode)
+                    if button and button.is_pressed:
+                        self.release_button(button, frame_now)
+
+                elif event.type == pygame.WINDOWEXPOSED:
+                    exposed = True
+
+            # The window contents were lost (uncovered, restored), repaint everything
+            if exposed:
+                self.screen.blit(self.static_bg, (0, 0))
+                for button in self.buttons:
+                    if button.is_pressed:
+                        self.changed_buttons.add(button)
+                midi_buffer.invalidate()
+
+            # Redraw only buttons that changed, the rest of the screen is kept from earlier frames
+            dirty = []
+            for button in self.changed_buttons:
+                if button.is_pressed:
+                    self.screen.blit(self._pressed_surf[button.color_pressed], button.rect)
+                    self.screen.blit(button.label_surf, button.label_pos)
+                else:
+                    self.screen.blit(self.static_bg, button.rect, button.rect)
+                dirty.append(button.rect)
+            self.changed_buttons.clear()
             
             # pygame.draw.rect(self.screen, (100, 200, 100), self.save_button)
             # font = pygame.font.Font(None, 36)
@@ -338,10 +570,16 @@ class MidiPiano:
             # text_rect = text.get_rect(center=self.save_button.center)
             # self.screen.blit(text, text_rect)
             
-            midi_buffer.render(self.screen, pygame.Rect(20, 580, 1018, 200), time.time())
-
+            if midi_buffer.render(self.roll_surf, self.roll_surf.get_rect(),
+                                  frame_now - midi_buffer.start_time):
+                dirty.append(self.roll_rect)
 
-            pygame.display.flip()
+            if exposed:
+                pygame.display.flip()
+                exposed = False
+            elif dirty:
+                pygame.display.update(dirty)
+            self.clock.tick(self.fps)
 
         self.midi_device.cleanup()
         pygame.midi.quit()
@@ -373,14 +611,16 @@ def enumerate_midi_devices():
 def main():
     parser = argparse.ArgumentParser(description='MIDI Piano')
     parser.add_argument('--output-device', type=str, help='MIDI device name (partial match)')
+    parser.add_argument('--fps', type=int, default=60, help='Frame rate cap')
     args = parser.parse_args()
 
     # Call the function to enumerate MIDI devices
     enumerate_midi_devices()
+    warm_up_render_kernel()
     try:
         midi_device = MidiDevice(args.output_device)
         midi_buffer = MidiBuffer()
-        piano = MidiPiano(midi_device)
+        piano = MidiPiano(midi_device, fps=args.fps)
         
         # Connect buffer to piano events
         piano.add_event_handler(midi_buffer.add_event)